@@ -2,11 +2,6 @@ import argparse
 from pathlib import Path
 from typing import cast
 
-from .change import apply_changes, reverse_changes, split_changes
-from .diff import diff
-from .editor import Editor
-from .editor.render.changes import render_changes
-
 parser = argparse.ArgumentParser()
 parser.add_argument("--print", action="store_true")
 parser.add_argument("old", type=Path)
@@ -19,19 +14,27 @@ def main() -> int:
     old = cast(Path, args.old)
     new = cast(Path, args.new)
 
-    old_to_new = tuple(diff(old, new))
+    # Import lazily so that argument parsing (and --help) does not have to
+    # wait for the rest of the package to load
+    from .change import apply_changes, reverse_changes, split_changes
+    from .diff import diff
+
+    old_to_new = diff(old, new)
 
     if only_print:
+        from .editor.render.changes import render_changes
+
         render_changes(old_to_new, None, None, None).print()
         return 0
 
+    from .editor import Editor
+
     selection = Editor(old_to_new).run()
 
     if selection is None:
         return 1
 
     _, selected_to_new = split_changes(old_to_new, selection)
-    new_to_selected = reverse_changes(selected_to_new)
-    apply_changes(new, new_to_selected)
+    apply_changes(new, reverse_changes(selected_to_new))
 
     return 0
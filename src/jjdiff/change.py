@@ -1,101 +1,105 @@
 import dataclasses
+import os
 import shutil
 import stat
-from collections.abc import Iterable, Iterator, Sequence, Set
-from dataclasses import dataclass
+import sys
+from collections.abc import Iterable, Iterator, Mapping, Sequence, Set
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Literal
+from typing import Literal, NamedTuple
 
 from .deprioritize import is_path_deprioritized
 
 type LineStatus = Literal["added", "deleted", "changed", "unchanged"]
 
 
-@dataclass
+@dataclass(slots=True)
 class Line:
     old: str | None
     new: str | None
+    # The status is read a lot while navigating and rendering, so we compute
+    # it once when the line is created
+    status: LineStatus = field(init=False, repr=False, compare=False)
 
-    @property
-    def status(self) -> LineStatus:
+    def __post_init__(self) -> None:
         if self.old is None:
-            return "added"
+            self.status = "added"
         elif self.new is None:
-            return "deleted"
+            self.status = "deleted"
         elif self.old != self.new:
-            return "changed"
+            self.status = "changed"
         else:
-            return "unchanged"
+            self.status = "unchanged"
 
 
-@dataclass
+@dataclass(slots=True)
 class Rename:
     old_path: Path
     new_path: Path
 
 
-@dataclass
+@dataclass(slots=True)
 class ChangeMode:
     path: Path
     old_is_exec: bool
     new_is_exec: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class AddFile:
     path: Path
     lines: list[Line]
     is_exec: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class ModifyFile:
     path: Path
     lines: list[Line]
 
 
-@dataclass
+@dataclass(slots=True)
 class DeleteFile:
     path: Path
     lines: list[Line]
     is_exec: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class AddBinary:
     path: Path
     content_path: Path
     is_exec: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class ModifyBinary:
     path: Path
     old_content_path: Path
     new_content_path: Path
 
 
-@dataclass
+@dataclass(slots=True)
 class DeleteBinary:
     path: Path
     content_path: Path
     is_exec: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class AddSymlink:
     path: Path
     to: Path
 
 
-@dataclass
+@dataclass(slots=True)
 class ModifySymlink:
     path: Path
     old_to: Path
     new_to: Path
 
 
-@dataclass
+@dataclass(slots=True)
 class DeleteSymlink:
     path: Path
     to: Path
@@ -115,71 +119,78 @@ def reverse_changes(changes: Iterable[Change]) -> Sequence[Change]:
     renames: dict[Path, Path] = {}
 
     for change in changes:
-        match change:
-            case Rename(old_path, new_path):
-                reversed_changes.append(Rename(new_path, old_path))
-                renames[old_path] = new_path
+        if isinstance(change, Rename):
+            reversed_changes.append(Rename(change.new_path, change.old_path))
+            renames[change.old_path] = change.new_path
+            continue
 
-            case ChangeMode(path, old_is_exec, new_is_exec):
-                path = renames.get(path, path)
+        path = renames.get(change.path, change.path)
+
+        match change:
+            case ChangeMode(_, old_is_exec, new_is_exec):
                 reversed_changes.append(ChangeMode(path, new_is_exec, old_is_exec))
 
-            case AddFile(path, lines, is_exec):
-                path = renames.get(path, path)
+            case AddFile(_, lines, is_exec):
                 reversed_changes.append(DeleteFile(path, reverse_lines(lines), is_exec))
 
-            case ModifyFile(path, lines):
-                path = renames.get(path, path)
+            case ModifyFile(_, lines):
                 reversed_changes.append(ModifyFile(path, reverse_lines(lines)))
 
-            case DeleteFile(path, lines, is_exec):
-                path = renames.get(path, path)
+            case DeleteFile(_, lines, is_exec):
                 reversed_changes.append(AddFile(path, reverse_lines(lines), is_exec))
 
-            case AddBinary(path, content_path, is_exec):
-                path = renames.get(path, path)
+            case AddBinary(_, content_path, is_exec):
                 reversed_changes.append(DeleteBinary(path, content_path, is_exec))
 
-            case ModifyBinary(path, old_content_path, new_content_path):
-                path = renames.get(path, path)
+            case ModifyBinary(_, old_content_path, new_content_path):
                 reversed_changes.append(
                     ModifyBinary(path, new_content_path, old_content_path)
                 )
 
-            case DeleteBinary(path, content_path, is_exec):
-                path = renames.get(path, path)
+            case DeleteBinary(_, content_path, is_exec):
                 reversed_changes.append(AddBinary(path, content_path, is_exec))
 
-            case AddSymlink(path, to):
-                path = renames.get(path, path)
+            case AddSymlink(_, to):
                 reversed_changes.append(DeleteSymlink(path, to))
 
-            case ModifySymlink(path, old_to, new_to):
-                path = renames.get(path, path)
+            case ModifySymlink(_, old_to, new_to):
                 reversed_changes.append(ModifySymlink(path, new_to, old_to))
 
-            case DeleteSymlink(path, to):
-                path = renames.get(path, path)
+            case DeleteSymlink(_, to):
                 reversed_changes.append(AddSymlink(path, to))
 
     reversed_changes.sort(key=change_key)
     return reversed_changes
 
 
-def change_key(change: Change) -> tuple[bool, Path, int]:
-    match change:
-        case Rename(path):
-            priority = 0
-        case ChangeMode(path):
-            priority = 1
-        case DeleteFile(path) | DeleteBinary(path) | DeleteSymlink(path):
-            priority = 2
-        case ModifyFile(path) | ModifyBinary(path) | ModifySymlink(path):
-            priority = 3
-        case AddFile(path) | AddBinary(path) | AddSymlink(path):
-            priority = 4
+CHANGE_PRIORITY: Mapping[type[Change], int] = {
+    Rename: 0,
+    ChangeMode: 1,
+    DeleteFile: 2,
+    DeleteBinary: 2,
+    DeleteSymlink: 2,
+    ModifyFile: 3,
+    ModifyBinary: 3,
+    ModifySymlink: 3,
+    AddFile: 4,
+    AddBinary: 4,
+    AddSymlink: 4,
+}
+
 
-    return (is_change_deprioritized(change), path, priority)
+def change_key(change: Change) -> tuple[bool, tuple[str, ...], int]:
+    if isinstance(change, Rename):
+        path = change.old_path
+    else:
+        path = change.path
+
+    # Comparing the parts orders the same as comparing the paths, but it can
+    # be done without going through PurePath.__lt__ for every comparison
+    return (
+        is_change_deprioritized(change),
+        path.parts,
+        CHANGE_PRIORITY[type(change)],
+    )
 
 
 def is_change_deprioritized(change: Change) -> bool:
@@ -190,16 +201,20 @@ def is_change_deprioritized(change: Change) -> bool:
 
 
 def reverse_lines(lines: list[Line]) -> list[Line]:
-    return [Line(line.new, line.old) for line in lines]
+    # Lines are never modified so if both sides are the same object reversing
+    # is a no-op and we can reuse the line
+    return [
+        line if line.old is line.new else Line(line.new, line.old) for line in lines
+    ]
 
 
-@dataclass(frozen=True)
-class ChangeRef:
+# Refs are hashed a lot when selecting, as named tuples they are hashed and
+# compared in C instead of through a generated __hash__ and __eq__
+class ChangeRef(NamedTuple):
     change: int
 
 
-@dataclass(frozen=True)
-class LineRef:
+class LineRef(NamedTuple):
     change: int
     line: int
 
@@ -215,22 +230,33 @@ def split_changes(
     sel_to_new: list[Change] = []
     renames: dict[Path, Path] = {}
 
+    # Split up the refs by kind so we can look them up by index instead of
+    # constructing a ref for every change and line
+    selected_changes: set[int] = set()
+    selected_lines: dict[int, set[int]] = {}
+    for ref in refs:
+        match ref:
+            case ChangeRef(change):
+                selected_changes.add(change)
+            case LineRef(change, line):
+                selected_lines.setdefault(change, set()).add(line)
+
     for change_index, change in enumerate(changes):
-        change_ref = ChangeRef(change_index)
+        change_selected = change_index in selected_changes
 
         # For non file changes we just include the whole change or not
         if not isinstance(change, FILE_CHANGE_TYPES):
-            if change_ref in refs:
+            if change_selected:
                 old_to_sel.append(change)
                 if isinstance(change, Rename):
                     renames[change.old_path] = change.new_path
             else:
+                # Only copy the change if its path was affected by a rename
                 if isinstance(change, Rename):
-                    old_path = renames.get(change.old_path, change.old_path)
-                    change = dataclasses.replace(change, old_path=old_path)
-                else:
-                    path = renames.get(change.path, change.path)
-                    change = dataclasses.replace(change, path=path)
+                    if change.old_path in renames:
+                        change = Rename(renames[change.old_path], change.new_path)
+                elif change.path in renames:
+                    change = dataclasses.replace(change, path=renames[change.path])
                 sel_to_new.append(change)
             continue
 
@@ -241,12 +267,14 @@ def split_changes(
         sel_to_new_lines: list[Line] = []
         sel_to_new_lines_changed = False
 
+        change_selected_lines = selected_lines.get(change_index, set())
+
         for line_index, line in enumerate(change.lines):
             if line.status == "unchanged":
                 old_to_sel_lines.append(line)
                 sel_to_new_lines.append(line)
 
-            elif LineRef(change_index, line_index) in refs:
+            elif line_index in change_selected_lines:
                 old_to_sel_lines.append(line)
                 if line.new is not None:
                     sel_to_new_lines.append(Line(line.new, line.new))
@@ -261,7 +289,7 @@ def split_changes(
         # Now we can check what the filtered change looks like
         match change:
             case AddFile(path, _, is_exec):
-                if change_ref in refs:
+                if change_selected:
                     old_to_sel.append(AddFile(path, old_to_sel_lines, is_exec))
                     if sel_to_new_lines_changed:
                         sel_path = renames.get(path, path)
@@ -279,7 +307,7 @@ def split_changes(
                     sel_to_new.append(ModifyFile(sel_path, sel_to_new_lines))
 
             case DeleteFile(path, _, is_exec):
-                if change_ref in refs:
+                if change_selected:
                     old_to_sel.append(DeleteFile(path, old_to_sel_lines, is_exec))
                     assert not sel_to_new_lines
                 else:
@@ -292,76 +320,114 @@ def split_changes(
 
 
 def apply_changes(root: Path, changes: Iterable[Change]) -> None:
-    for change in changes:
-        apply_change(root, change)
+    # Keep track of the directories we know to exist so we only have to
+    # create every directory once
+    dirs: set[Path] = {root}
 
+    for change in changes:
+        apply_change(root, change, dirs)
 
-def apply_change(root: Path, change: Change) -> None:
-    renames: dict[Path, Path] = {}
 
+def apply_change(root: Path, change: Change, dirs: set[Path]) -> None:
     match change:
         case Rename(old_path, new_path):
             full_old_path = root / old_path
             full_new_path = root / new_path
-            full_new_path.mkdir(exist_ok=True, parents=True)
+            ensure_dir(full_new_path.parent, dirs)
             full_old_path.rename(full_new_path)
 
         case ChangeMode(path, _, is_exec):
-            path = renames.get(path, path)
             full_path = root / path
             set_is_exec(full_path, is_exec)
 
-        case (
-            AddFile(path)
-            | ModifyFile(path)
-            | AddBinary(path)
-            | ModifyBinary(path)
-            | AddSymlink(path)
-            | ModifySymlink(path)
-        ):
-            path = renames.get(path, path)
+        case AddFile(path, lines, is_exec):
             full_path = root / path
+            ensure_dir(full_path.parent, dirs)
+            write_lines(full_path, lines)
+            if is_exec:
+                set_is_exec(full_path, True)
 
-            full_path.parent.mkdir(parents=True, exist_ok=True)
-            match change:
-                case AddFile(_, lines) | ModifyFile(_, lines):
-                    write_lines(full_path, lines)
-                case AddBinary(_, content_path) | ModifyBinary(_, _, content_path):
-                    shutil.copyfile(content_path, full_path)
-                case AddSymlink(_, to) | ModifySymlink(_, _, to):
-                    full_path.symlink_to(to)
+        case ModifyFile(path, lines):
+            full_path = root / path
+            ensure_dir(full_path.parent, dirs)
+            write_lines(full_path, lines)
 
-            if isinstance(change, (AddFile, AddBinary)) and change.is_exec:
+        case AddBinary(path, content_path, is_exec):
+            full_path = root / path
+            ensure_dir(full_path.parent, dirs)
+            copy_file(content_path, full_path)
+            if is_exec:
                 set_is_exec(full_path, True)
 
+        case ModifyBinary(path, _, content_path):
+            full_path = root / path
+            ensure_dir(full_path.parent, dirs)
+            copy_file(content_path, full_path)
+
+        case AddSymlink(path, to) | ModifySymlink(path, _, to):
+            full_path = root / path
+            ensure_dir(full_path.parent, dirs)
+            full_path.symlink_to(to)
+
         case DeleteFile(path) | DeleteBinary(path) | DeleteSymlink(path):
-            path = renames.get(path, path)
             full_path = root / path
 
             full_path.unlink()
 
             full_path = full_path.parent
-            while full_path != root and not any(full_path.iterdir()):
+            while full_path != root and is_empty_dir(full_path):
                 full_path.relative_to(root)
                 full_path.rmdir()
+                dirs.discard(full_path)
                 full_path = full_path.parent
 
 
+def ensure_dir(path: Path, dirs: set[Path]) -> None:
+    if path in dirs:
+        return
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    # All parents exist now as well
+    while path not in dirs:
+        dirs.add(path)
+        path = path.parent
+
+
+def is_empty_dir(path: Path) -> bool:
+    with os.scandir(path) as entries:
+        return next(entries, None) is None
+
+
 def write_lines(path: Path, lines: list[Line]) -> None:
     with path.open("w", newline="") as f:
-        line_iter = (line.new for line in lines if line.new is not None)
-
-        try:
-            prev_line = next(line_iter)
-        except StopIteration:
-            return
+        f.write("\n".join(line.new for line in lines if line.new is not None))
 
-        for line in line_iter:
-            f.write(prev_line)
-            f.write("\n")
-            prev_line = line
 
-        f.write(prev_line)
+def copy_file(src: Path, dst: Path) -> None:
+    if sys.platform == "linux":
+        # Let the kernel copy the data directly, this avoids passing it
+        # through userspace and allows filesystems to share the blocks
+        try:
+            with src.open("rb") as src_file, dst.open("wb") as dst_file:
+                size = os.fstat(src_file.fileno()).st_size
+                while size > 0:
+                    copied = os.copy_file_range(
+                        src_file.fileno(), dst_file.fileno(), size
+                    )
+                    if not copied:
+                        break
+                    size -= copied
+
+            # Some filesystems stop early without an error, in that case we
+            # redo the copy the regular way
+            if size <= 0:
+                return
+        except OSError:
+            # Not supported for these files, use a regular copy instead
+            pass
+
+    shutil.copyfile(src, dst)
 
 
 def set_is_exec(path: Path, is_exec: bool) -> None:
@@ -393,49 +459,45 @@ type Dep = tuple[Ref, Ref]
 
 
 def get_dependencies(changes: Iterable[Change]) -> Iterator[Dep]:
-    yield from get_path_dependencies(changes)
-    yield from get_line_dependencies(changes)
-
-
-def get_path_dependencies(changes: Iterable[Change]) -> Iterator[Dep]:
     deletes: dict[Path, ChangeRef] = {}
 
     for change_index, change in enumerate(changes):
         change_ref = ChangeRef(change_index)
 
         match change:
-            case DeleteFile(path) | DeleteBinary(path) | DeleteSymlink(path):
+            case DeleteFile(path, lines):
                 deletes[path] = change_ref
+                for line_index in range(len(lines)):
+                    line_ref = LineRef(change_index, line_index)
+                    # File cannot be deleted unless line is deleted
+                    yield (change_ref, line_ref)
 
-            case AddFile(path) | AddBinary(path) | AddSymlink(path):
-                try:
-                    dependency = deletes[path]
-                except KeyError:
-                    pass
-                else:
-                    # Add cannot be done unless previous delete is done
-                    yield (change_ref, dependency)
-
-            case _:
-                pass
-
-
-def get_line_dependencies(changes: Iterable[Change]) -> Iterator[Dep]:
-    for change_index, change in enumerate(changes):
-        change_ref = ChangeRef(change_index)
+            case DeleteBinary(path) | DeleteSymlink(path):
+                deletes[path] = change_ref
 
-        match change:
-            case AddFile(_, lines):
+            case AddFile(path, lines):
+                yield from get_add_dependencies(path, change_ref, deletes)
                 for line_index in range(len(lines)):
                     line_ref = LineRef(change_index, line_index)
                     # Line cannot be added unless file is added
                     yield (line_ref, change_ref)
 
-            case DeleteFile(_, lines):
-                for line_index in range(len(lines)):
-                    line_ref = LineRef(change_index, line_index)
-                    # File cannot be deleted unless line is deleted
-                    yield (change_ref, line_ref)
+            case AddBinary(path) | AddSymlink(path):
+                yield from get_add_dependencies(path, change_ref, deletes)
 
             case _:
                 pass
+
+
+def get_add_dependencies(
+    path: Path,
+    change_ref: ChangeRef,
+    deletes: Mapping[Path, ChangeRef],
+) -> Iterator[Dep]:
+    try:
+        dependency = deletes[path]
+    except KeyError:
+        pass
+    else:
+        # Add cannot be done unless previous delete is done
+        yield (change_ref, dependency)
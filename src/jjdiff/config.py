@@ -39,7 +39,6 @@ class Config(BaseModel):
     @computed_field
     @cached_property
     def keymap(self) -> dict[Key, str]:
-        print("setting keymap")
         keymap: dict[Key, str] = {}
 
         for command in KeybindingsConfig.model_fields:
@@ -75,25 +74,3 @@ def get_config() -> Config:
         return Config()
     else:
         return Config.model_validate(data)
-
-
-def path_deprioritized(path: Path) -> bool:
-    for glob in get_config().diff.deprioritize:
-        glob = gitglob_to_shellglob(glob)
-        if path.match(glob):
-            return True
-    return False
-
-
-def gitglob_to_shellglob(glob: str) -> str:
-    # git globs need a leading slash to be anchored to the root
-    if glob.startswith("/"):
-        glob = glob[1:]
-    else:
-        glob = f"**/{glob}"
-
-    # a trailing slash should include everything in the directory
-    if glob.endswith("/"):
-        glob = f"{glob}**"
-
-    return glob
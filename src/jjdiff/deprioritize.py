@@ -1,25 +1,46 @@
+import glob
+import re
+from collections.abc import Iterable
+from functools import lru_cache
 from pathlib import Path
 
 from .config import get_config
 
 
+@lru_cache(None)
 def is_path_deprioritized(path: Path) -> bool:
-    for glob in get_config().diff.deprioritize:
-        glob = gitglob_to_shellglob(glob)
-        if path.match(glob):
-            return True
-    return False
+    return get_deprioritize_pattern().fullmatch(path.as_posix()) is not None
 
 
-def gitglob_to_shellglob(glob: str) -> str:
+@lru_cache(1)
+def get_deprioritize_pattern() -> re.Pattern[str]:
+    return compile_gitglobs(get_config().diff.deprioritize)
+
+
+def compile_gitglobs(gitglobs: Iterable[str]) -> re.Pattern[str]:
+    # Combine all globs into one regex so a path only has to be matched once
+    patterns = [
+        glob.translate(
+            gitglob_to_shellglob(gitglob),
+            recursive=True,
+            include_hidden=True,
+            seps="/",
+        )
+        for gitglob in gitglobs
+    ]
+    # Without any globs nothing should match
+    return re.compile("|".join(patterns) or "(?!)")
+
+
+def gitglob_to_shellglob(pattern: str) -> str:
     # git globs need a leading slash to be anchored to the root
-    if glob.startswith("/"):
-        glob = glob[1:]
+    if pattern.startswith("/"):
+        pattern = pattern[1:]
     else:
-        glob = f"**/{glob}"
+        pattern = f"**/{pattern}"
 
     # a trailing slash should include everything in the directory
-    if glob.endswith("/"):
-        glob = f"{glob}**"
+    if pattern.endswith("/"):
+        pattern = f"{pattern}**"
 
-    return glob
+    return pattern
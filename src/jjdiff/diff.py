@@ -1,14 +1,16 @@
+import bisect
 import hashlib
 import heapq
 import mmap
+import os
 import stat
 from collections import Counter
-from collections.abc import Iterator, Mapping
+from collections.abc import Generator, Iterable, Iterator, Mapping
 from dataclasses import dataclass
 from difflib import SequenceMatcher
-from itertools import product
+from functools import cached_property
 from pathlib import Path
-from typing import override
+from typing import Literal, override
 
 from .change import (
     AddBinary,
@@ -28,6 +30,7 @@ from .change import (
 )
 
 SIMILARITY_THRESHOLD = 0.6
+COMPARE_BLOCK_SIZE = 1 << 16
 
 
 @dataclass
@@ -35,6 +38,25 @@ class File:
     content_path: Path
     is_exec: bool
 
+    # We need the lines of a file in multiple places, most notably when
+    # comparing it against every candidate for a rename, so we only want to
+    # read it once
+    @cached_property
+    def lines(self) -> list[str] | None:
+        return split_lines(self.content_path)
+
+    # The same goes for the line counts of a text file and the chunks of a
+    # binary file
+    @cached_property
+    def line_counts(self) -> Counter[str] | None:
+        if (lines := self.lines) is None:
+            return None
+        return get_line_counts(lines)
+
+    @cached_property
+    def chunks(self) -> set[int]:
+        return set(get_binary_chunk_hashes(self.content_path))
+
 
 @dataclass
 class Symlink:
@@ -56,36 +78,39 @@ class Contents(Mapping[Path, Content]):
     def __init__(self, root: Path):
         self.root = root.resolve()
 
+    # We walk the tree once and keep what we found, so that lookups are just
+    # a dict lookup instead of several syscalls each time
+    @cached_property
+    def contents(self) -> dict[Path, Content]:
+        contents: dict[Path, Content] = {}
+        dirs = [Path()]
+
+        while dirs:
+            dir = dirs.pop()
+            with os.scandir(self.root / dir) as entries:
+                for entry in entries:
+                    path = dir / entry.name
+                    if entry.is_symlink():  # Symlink has to come first
+                        contents[path] = Symlink(Path(os.readlink(entry.path)))
+                    elif entry.is_dir():
+                        dirs.append(path)
+                    elif entry.is_file():
+                        is_exec = bool(entry.stat().st_mode & stat.S_IXUSR)
+                        contents[path] = File(self.root / path, is_exec)
+
+        return contents
+
     @override
     def __iter__(self) -> Iterator[Path]:
-        for root, _, names in self.root.walk():
-            for name in names:
-                path = root / name
-                if path.is_symlink() or path.is_file():
-                    yield path.relative_to(self.root)
+        return iter(self.contents)
 
     @override
     def __len__(self):
-        res = 0
-        for _ in self:
-            res += 1
-        return res
+        return len(self.contents)
 
     @override
     def __getitem__(self, path: Path) -> Content:
-        full_path = self.root / path
-        try:
-            full_path.resolve().relative_to(self.root)
-        except ValueError:
-            raise KeyError(path)
-
-        if full_path.is_symlink():  # Symlink has to come first
-            return Symlink(full_path.readlink())
-        elif full_path.is_file():
-            is_exec = bool(full_path.stat().st_mode & stat.S_IXUSR)
-            return File(full_path, is_exec)
-        else:
-            raise KeyError(full_path)
+        return self.contents[path]
 
 
 def diff_contents(
@@ -108,15 +133,12 @@ def diff_contents(
     # Now we look for all paths that are in old but not in new
     deleted = {path: old[path] for path in old if path not in new}
 
-    # Now we try to find renames between the old and new paths
-    renames: list[tuple[float, Path, Path]] = []
-
-    for (old_path, old_content), (new_path, new_content) in product(
-        deleted.items(), added.items()
-    ):
-        similarity = get_content_similarity(old_content, new_content)
-        if similarity >= SIMILARITY_THRESHOLD:
-            heapq.heappush(renames, (-similarity, old_path, new_path))
+    # Now we try to find renames between the old and new paths, this is only
+    # possible if there are both
+    if deleted and added:
+        renames = find_renames(deleted, added)
+    else:
+        renames = []
 
     renamed: dict[Path, Path] = {}
     while renames:
@@ -144,6 +166,63 @@ def diff_contents(
     return changes
 
 
+def find_renames(
+    deleted: Mapping[Path, Content],
+    added: Mapping[Path, Content],
+) -> list[tuple[float, Path, Path]]:
+    renames: list[tuple[float, Path, Path]] = []
+
+    # Content can only be renamed to content of the same kind, so we only
+    # have to look at the kinds that were both deleted and added. This avoids
+    # chunking binaries or counting lines when nothing could match them.
+    old_kinds = {path: get_content_kind(content) for path, content in deleted.items()}
+    new_kinds = {path: get_content_kind(content) for path, content in added.items()}
+    kinds = set(old_kinds.values()) & set(new_kinds.values())
+
+    # A rename needs some overlap in content, so we index the deleted paths by
+    # their rename keys and only compare against paths that share one
+    candidates: dict[RenameKey, list[Path]] = {}
+    for old_path, old_content in deleted.items():
+        if old_kinds[old_path] in kinds:
+            for key in get_rename_keys(old_content):
+                candidates.setdefault(key, []).append(old_path)
+
+    old_sizes: dict[Path, int] = {}
+    for new_path, new_content in added.items():
+        if new_kinds[new_path] not in kinds:
+            continue
+
+        old_paths = {
+            old_path
+            for key in get_rename_keys(new_content)
+            for old_path in candidates.get(key, ())
+        }
+        if not old_paths:
+            continue
+
+        new_size = get_rename_size(new_content)
+        for old_path in old_paths:
+            old_content = deleted[old_path]
+            try:
+                old_size = old_sizes[old_path]
+            except KeyError:
+                old_size = old_sizes[old_path] = get_rename_size(old_content)
+
+            # The similarity is at most 2 * min / total, so if the sizes are
+            # too far apart we do not have to compare the content
+            if (
+                min(old_size, new_size) * 2
+                < (old_size + new_size) * SIMILARITY_THRESHOLD
+            ):
+                continue
+
+            similarity = get_content_similarity(old_content, new_content)
+            if similarity >= SIMILARITY_THRESHOLD:
+                heapq.heappush(renames, (-similarity, old_path, new_path))
+
+    return renames
+
+
 def diff_content(
     path: Path,
     old_content: Content,
@@ -156,7 +235,7 @@ def diff_content(
                     yield ChangeMode(path, old_is_exec, new_is_exec)
                 return
 
-            match split_lines(old_content_path), split_lines(new_content_path):
+            match old_content.lines, new_content.lines:
                 case list(old_lines), list(new_lines):
                     if old_is_exec != new_is_exec:
                         yield ChangeMode(path, old_is_exec, new_is_exec)
@@ -189,18 +268,26 @@ def diff_content(
 
 
 def content_is_equal(old_content: Path, new_content: Path) -> bool:
+    old_stat = old_content.stat()
+    new_stat = new_content.stat()
+
+    # The same file is always equal, this happens with hardlinks
+    if os.path.samestat(old_stat, new_stat):
+        return True
+
     # Different size is never equal
-    if old_content.stat().st_size != new_content.stat().st_size:
+    if old_stat.st_size != new_stat.st_size:
         return False
 
-    # Compare content through mmap
-    with (
-        old_content.open("rb") as old_file,
-        new_content.open("rb") as new_file,
-        mmap.mmap(old_file.fileno(), 0, access=mmap.ACCESS_READ) as old_data,
-        mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ) as new_data,
-    ):
-        return old_data == new_data
+    # Compare content block by block so we can stop at the first difference
+    with old_content.open("rb") as old_file, new_content.open("rb") as new_file:
+        while True:
+            old_block = old_file.read(COMPARE_BLOCK_SIZE)
+            new_block = new_file.read(COMPARE_BLOCK_SIZE)
+            if old_block != new_block:
+                return False
+            if not old_block:
+                return True
 
 
 def get_content_similarity(old_content: Content, new_content: Content) -> float:
@@ -209,11 +296,11 @@ def get_content_similarity(old_content: Content, new_content: Content) -> float:
             if content_is_equal(old_content_path, new_content_path):
                 return 1
 
-            match split_lines(old_content_path), split_lines(new_content_path):
-                case list(old_lines), list(new_lines):
-                    return get_text_similarity(old_lines, new_lines)
+            match old_content.line_counts, new_content.line_counts:
+                case Counter() as old_counts, Counter() as new_counts:
+                    return get_text_similarity(old_counts, new_counts)
                 case None, None:
-                    return get_binary_similarity(old_content_path, new_content_path)
+                    return get_binary_similarity(old_content.chunks, new_content.chunks)
                 case _:
                     return 0
 
@@ -224,53 +311,81 @@ def get_content_similarity(old_content: Content, new_content: Content) -> float:
             return 0
 
 
-def split_lines(path: Path) -> list[str] | None:
-    lines: list[str] = []
-    trailing_newline = True
+type ContentKind = Literal["text", "binary", "symlink"]
+
+
+def get_content_kind(content: Content) -> ContentKind:
+    match content:
+        case File():
+            if content.lines is None:
+                return "binary"
+            else:
+                return "text"
+        case Symlink():
+            return "symlink"
+
+
+# Text files are keyed by their stripped lines and binary files by their
+# chunks. Text files without any such lines are all similar to each other so
+# they share the empty string as key, and symlinks are always compared with
+# each other so they share None as key.
+type RenameKey = str | int | None
+
+
+def get_rename_keys(content: Content) -> Iterable[RenameKey]:
+    match content:
+        case File():
+            if (line_counts := content.line_counts) is None:
+                return content.chunks
+            else:
+                return line_counts.keys() or [""]
+        case Symlink():
+            return [None]
+
+
+# The number of elements the similarity of a content is based on
+def get_rename_size(content: Content) -> int:
+    match content:
+        case File():
+            if (line_counts := content.line_counts) is None:
+                return len(content.chunks)
+            else:
+                return line_counts.total()
+        case Symlink(to):
+            return len(str(to))
 
+
+def split_lines(path: Path) -> list[str] | None:
     try:
-        with path.open("r", newline="") as f:
-            for line in f:
-                trailing_newline = line.endswith("\n")
-                if trailing_newline:
-                    line = line[:-1]
-                lines.append(line)
+        text = path.read_bytes().decode()
     except UnicodeDecodeError:
         return None
 
-    if trailing_newline:
-        lines.append("")
-
-    return lines
+    # A trailing newline results in an empty last line, just like we want
+    return text.split("\n")
 
 
-def get_text_similarity(old_lines: list[str], new_lines: list[str]) -> float:
-    old_counts = get_line_counts(old_lines)
-    new_counts = get_line_counts(new_lines)
-
+def get_text_similarity(old_counts: Counter[str], new_counts: Counter[str]) -> float:
     total = old_counts.total() + new_counts.total()
     if total == 0:
         return 1
 
-    common = (old_counts & new_counts).total()
+    # Iterate over the smaller counter and look up in the larger one, this
+    # avoids building an intersection counter just to sum it
+    if len(new_counts) < len(old_counts):
+        old_counts, new_counts = new_counts, old_counts
+    get_new_count = new_counts.get
+    common = sum(
+        min(old_count, get_new_count(line, 0)) for line, old_count in old_counts.items()
+    )
     return common * 2 / total
 
 
 def get_line_counts(lines: list[str]) -> Counter[str]:
-    counts = Counter[str]()
-
-    for line in lines:
-        line = line.strip()
-        if line:
-            counts[line] += 1
+    return Counter(filter(None, map(str.strip, lines)))
 
-    return counts
-
-
-def get_binary_similarity(old_content_path: Path, new_content_path: Path) -> float:
-    old_chunks = set(map(stable_hash, get_binary_chunks(old_content_path)))
-    new_chunks = set(map(stable_hash, get_binary_chunks(new_content_path)))
 
+def get_binary_similarity(old_chunks: set[int], new_chunks: set[int]) -> float:
     total = len(old_chunks) + len(new_chunks)
     if total == 0:
         return 1
@@ -279,57 +394,69 @@ def get_binary_similarity(old_content_path: Path, new_content_path: Path) -> flo
     return common * 2 / total
 
 
-WINDOW_SIZE = 48
-WINDOW_MASK = (1 << 12) - 1
-
-HASH_BASE = 263
-HASH_MODULUS = (1 << 31) - 1
-HASH_BASE_POWER = pow(HASH_BASE, WINDOW_SIZE, HASH_MODULUS)
-
+# A gear hash shifts out old bytes by itself, so chunk boundaries only depend
+# on the last 64 bytes. We look at the top bits as those are affected by the
+# most bytes, this gives an average chunk size of 4 KiB on top of the minimum.
+CHUNK_MASK = ((1 << 12) - 1) << 52
+MIN_CHUNK_SIZE = 1 << 11
+HASH_WINDOW_SIZE = 64
+HASH_MASK = (1 << 64) - 1
+GEAR_TABLE = tuple(
+    int.from_bytes(hashlib.blake2b(bytes([byte]), digest_size=8).digest())
+    for byte in range(256)
+)
 
-def get_binary_chunks(path: Path) -> Iterator[memoryview]:
-    with (
-        path.open("rb") as file,
-        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as raw_data,
-    ):
-        # Wrap in memory view for zero copy chunks
-        data = memoryview(raw_data)
 
-        if len(data) <= WINDOW_SIZE:
-            yield data
+def get_binary_chunk_hashes(path: Path) -> Generator[int, None, None]:
+    with path.open("rb") as f:
+        # An empty file cannot be mapped, and it has no chunks anyway
+        if os.fstat(f.fileno()).st_size == 0:
             return
 
-        curr_hash = 0
-        for i in range(WINDOW_SIZE):
-            curr_hash = (curr_hash * HASH_BASE + data[i]) % HASH_MODULUS
-
-        start = 0
-        for i in range(WINDOW_SIZE, len(data)):
-            if curr_hash & WINDOW_MASK == 0:
-                chunk = data[start:i]
-                yield chunk
-                start = i
+        with (
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data_map,
+            memoryview(data_map) as data,
+        ):
+            yield from get_chunk_hashes(data)
 
-            old_byte = data[i - WINDOW_SIZE]
-            new_byte = data[i]
 
-            curr_hash = (
-                curr_hash - (old_byte * HASH_BASE_POWER) % HASH_MODULUS
-            ) % HASH_MODULUS
-            curr_hash = (curr_hash * HASH_BASE + new_byte) % HASH_MODULUS
+def get_chunk_hashes(data: memoryview) -> Iterator[int]:
+    # The map can only be closed once all views into it are released, so we
+    # release every slice we take before moving on. The hashes only have to
+    # be consistent within a single run, so we can use the builtin hash
+    # instead of a cryptographic one.
+    gear_table = GEAR_TABLE
+    start = 0
+    while len(data) - start > MIN_CHUNK_SIZE:
+        # A chunk cannot end before the minimum size, and only the bytes in
+        # the window before that end affect the hash, so we can skip the rest
+        first_end = start + MIN_CHUNK_SIZE
+        curr_hash = 0
+        with data[first_end - HASH_WINDOW_SIZE : first_end - 1] as window:
+            for byte in window:
+                curr_hash = ((curr_hash << 1) + gear_table[byte]) & HASH_MASK
 
-        if start < len(data):
-            yield data[start:]
+        end = len(data)
+        with data[first_end - 1 :] as rest:
+            for i, byte in enumerate(rest, first_end):
+                curr_hash = ((curr_hash << 1) + gear_table[byte]) & HASH_MASK
+                if not curr_hash & CHUNK_MASK:
+                    end = i
+                    break
 
+        with data[start:end] as chunk:
+            yield hash(chunk)
+        start = end
 
-def stable_hash(data: memoryview) -> bytes:
-    return hashlib.blake2b(data, digest_size=8).digest()
+    if start < len(data):
+        with data[start:] as chunk:
+            yield hash(chunk)
 
 
 def delete_content(path: Path, content: Content) -> Change:
     match content:
         case File(content_path, is_exec):
-            if old_lines := split_lines(content_path):
+            if old_lines := content.lines:
                 lines = [Line(line, None) for line in old_lines]
                 return DeleteFile(path, lines, is_exec)
             else:
@@ -341,7 +468,7 @@ def delete_content(path: Path, content: Content) -> Change:
 def add_content(path: Path, content: Content) -> Change:
     match content:
         case File(content_path, is_exec):
-            if new_lines := split_lines(content_path):
+            if new_lines := content.lines:
                 lines = [Line(None, line) for line in new_lines]
                 return AddFile(path, lines, is_exec)
             else:
@@ -353,11 +480,80 @@ def add_content(path: Path, content: Content) -> Change:
 def get_line_similarity(old: str, new: str) -> float:
     if old == new:
         return 1
-    else:
-        return SequenceMatcher(None, old, new).ratio()
+
+    # Anything below the threshold is treated the same as no similarity at
+    # all, so we can skip the full ratio when an upper bound is already too
+    # low. The bound based on length alone does not even need a matcher.
+    total = len(old) + len(new)
+    if min(len(old), len(new)) * 2 < total * SIMILARITY_THRESHOLD:
+        return 0
+
+    matcher = SequenceMatcher(None, old, new)
+    if matcher.quick_ratio() < SIMILARITY_THRESHOLD:
+        return 0
+    return matcher.ratio()
 
 
 def diff_lines(old: list[str], new: list[str]) -> list[Line]:
+    lines: list[Line] = []
+    old_index = 0
+    new_index = 0
+
+    # Lines that occur only once on both sides are almost certainly the same
+    # line, so we use them as anchors and only diff the parts in between
+    for old_anchor, new_anchor in get_anchors(old, new):
+        lines.extend(
+            diff_lines_trimmed(old[old_index:old_anchor], new[new_index:new_anchor])
+        )
+        lines.append(Line(old[old_anchor], new[new_anchor]))
+        old_index = old_anchor + 1
+        new_index = new_anchor + 1
+
+    lines.extend(diff_lines_trimmed(old[old_index:], new[new_index:]))
+    return lines
+
+
+def get_anchors(old: list[str], new: list[str]) -> list[tuple[int, int]]:
+    old_counts = Counter(old)
+    new_counts = Counter(new)
+    new_indexes = {
+        line: index for index, line in enumerate(new) if new_counts[line] == 1
+    }
+    pairs = [
+        (old_index, new_indexes[line])
+        for old_index, line in enumerate(old)
+        if old_counts[line] == 1 and line in new_indexes
+    ]
+
+    # The pairs are ordered by old index, we keep the longest sequence that is
+    # also ordered by new index. For every length we track the pair with the
+    # lowest new index that ends a sequence of that length.
+    ends: list[int] = []
+    end_pairs: list[int] = []
+    prev_pairs: list[int] = []
+
+    for pair_index, (_, new_index) in enumerate(pairs):
+        length = bisect.bisect_left(ends, new_index)
+        if length == len(ends):
+            ends.append(new_index)
+            end_pairs.append(pair_index)
+        else:
+            ends[length] = new_index
+            end_pairs[length] = pair_index
+        prev_pairs.append(end_pairs[length - 1] if length else -1)
+
+    anchors: list[tuple[int, int]] = []
+    pair_index = end_pairs[-1] if end_pairs else -1
+    while pair_index != -1:
+        anchors.append(pairs[pair_index])
+        pair_index = prev_pairs[pair_index]
+
+    anchors.reverse()
+    return anchors
+
+
+def diff_lines_trimmed(old: list[str], new: list[str]) -> list[Line]:
+    # Equal lines at the start and end do not need the expensive diff
     start = 0
     while start < len(old) and start < len(new) and old[start] == new[start]:
         start += 1
@@ -369,22 +565,28 @@ def diff_lines(old: list[str], new: list[str]) -> list[Line]:
         new_end -= 1
 
     lines = [Line(line, line) for line in old[:start]]
-    lines.extend(diff_lines_base(old[start:old_end], new[start:new_end]))
+    if start < old_end or start < new_end:
+        lines.extend(diff_lines_base(old[start:old_end], new[start:new_end]))
     lines.extend(Line(line, line) for line in old[old_end:])
     return lines
 
 
 def diff_lines_base(old: list[str], new: list[str]) -> list[Line]:
+    # States are stored with the operation that led to them, we only create
+    # the lines when backtracking from the end
+    # 0: old line changed into new line
+    # 1: new line added
+    # 2: old line deleted
     min_cost = 100 * abs(len(old) - len(new))
-    states: list[tuple[int, int, int, int, Line | None]] = [(min_cost, 0, 0, 0, None)]
-    line_to: dict[tuple[int, int], Line | None] = {}
+    states: list[tuple[int, int, int, int]] = [(min_cost, -1, 0, 0)]
+    op_to: dict[tuple[int, int], int] = {}
 
     while True:
-        min_cost, _, old_index, new_index, line = heapq.heappop(states)
+        min_cost, op, old_index, new_index = heapq.heappop(states)
 
-        if (old_index, new_index) in line_to:
+        if (old_index, new_index) in op_to:
             continue
-        line_to[(old_index, new_index)] = line
+        op_to[old_index, new_index] = op
 
         old_todo = len(old) - old_index
         new_todo = len(new) - new_index
@@ -392,13 +594,19 @@ def diff_lines_base(old: list[str], new: list[str]) -> list[Line]:
         if not old_todo and not new_todo:
             lines: list[Line] = []
 
-            while line is not None:
-                lines.append(line)
-                if line.old is not None:
-                    old_index -= 1
-                if line.new is not None:
-                    new_index -= 1
-                line = line_to[old_index, new_index]
+            while op != -1:
+                match op:
+                    case 0:
+                        old_index -= 1
+                        new_index -= 1
+                        lines.append(Line(old[old_index], new[new_index]))
+                    case 1:
+                        new_index -= 1
+                        lines.append(Line(None, new[new_index]))
+                    case _:
+                        old_index -= 1
+                        lines.append(Line(old[old_index], None))
+                op = op_to[old_index, new_index]
 
             lines.reverse()
             return lines
@@ -414,7 +622,6 @@ def diff_lines_base(old: list[str], new: list[str]) -> list[Line]:
                     2,
                     old_index + 1,
                     new_index,
-                    Line(old[old_index], None),
                 ),
             )
 
@@ -429,14 +636,11 @@ def diff_lines_base(old: list[str], new: list[str]) -> list[Line]:
                     1,
                     old_index,
                     new_index + 1,
-                    Line(None, new[new_index]),
                 ),
             )
 
         if old_todo and new_todo:
-            old_line = old[old_index]
-            new_line = new[new_index]
-            similarity = get_line_similarity(old_line, new_line)
+            similarity = get_line_similarity(old[old_index], new[new_index])
 
             if similarity >= SIMILARITY_THRESHOLD:
                 heapq.heappush(
@@ -449,6 +653,5 @@ def diff_lines_base(old: list[str], new: list[str]) -> list[Line]:
                         0,
                         old_index + 1,
                         new_index + 1,
-                        Line(old_line, new_line),
                     ),
                 )
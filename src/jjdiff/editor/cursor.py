@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from collections.abc import Iterator, Sequence
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
 from typing import cast, override
 
 from ..change import (
@@ -7,6 +8,7 @@ from ..change import (
     Change,
     ChangeRef,
     FileChange,
+    Line,
     LineRef,
     Ref,
     get_change_refs,
@@ -14,6 +16,9 @@ from ..change import (
 
 
 class Cursor(ABC):
+    # Without this the slots of the subclasses would still come with a dict
+    __slots__ = ()
+
     @abstractmethod
     def is_change_selected(self, change: int) -> bool:
         raise NotImplementedError
@@ -63,12 +68,10 @@ class Cursor(ABC):
         raise NotImplementedError
 
 
+@dataclass(frozen=True, slots=True)
 class ChangeCursor(Cursor):
     change: int
 
-    def __init__(self, change: int):
-        self.change = change
-
     @override
     def is_change_selected(self, change: int) -> bool:
         return self.change == change
@@ -128,14 +131,9 @@ class ChangeCursor(Cursor):
             return self
 
         # Now we find the first hunk
-        start = 0
-        while change.lines[start].status == "unchanged":
-            start += 1
-
-        end = start + 1
-        while end < len(change.lines) and change.lines[end].status != "unchanged":
-            end += 1
-
+        line = find_changed_line(change.lines, range(len(change.lines)))
+        assert line is not None
+        start, end = find_hunk(change.lines, line)
         return HunkCursor(self.change, start, end)
 
     @override
@@ -143,16 +141,12 @@ class ChangeCursor(Cursor):
         return get_change_refs(self.change, changes[self.change])
 
 
+@dataclass(frozen=True, slots=True)
 class HunkCursor(Cursor):
     change: int
     start: int
     end: int
 
-    def __init__(self, change: int, start: int, end: int):
-        self.change = change
-        self.start = start
-        self.end = end
-
     @override
     def is_change_selected(self, change: int) -> bool:
         return self.change == change
@@ -172,112 +166,47 @@ class HunkCursor(Cursor):
     @override
     def prev(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
         change_index = self.change
-        start = self.start
-        end = self.end
-
-        while True:
-            change = cast(FileChange, changes[change_index])
+        change = cast(FileChange, changes[change_index])
 
-            # Try to find the previous hunk end
-            end = start
-            while end > 0:
-                if change.lines[end - 1].status != "unchanged":
-                    break
-                end -= 1
-            else:
-                # No hunk found, so go to the previous file change and try
-                # again
-                while True:
-                    change_index = (change_index - 1) % len(changes)
-                    if ChangeRef(change_index) not in opened:
-                        continue
+        # Try to find the previous hunk end, otherwise go to the previous file
+        # changes until we find one
+        line = find_changed_line(change.lines, range(self.start - 1, -1, -1))
+        while line is None:
+            change_index, change = find_file_change(changes, opened, change_index, -1)
+            line = find_changed_line(change.lines, range(len(change.lines) - 1, -1, -1))
 
-                    prev_change = changes[change_index]
-                    if isinstance(prev_change, FILE_CHANGE_TYPES):
-                        break
-
-                start = len(prev_change.lines)
-                continue
-
-            # Find the start of the hunk
-            start = end - 1
-            while start > 0 and change.lines[start - 1].status != "unchanged":
-                start -= 1
-
-            return HunkCursor(change_index, start, end)
+        start, end = find_hunk(change.lines, line)
+        return HunkCursor(change_index, start, end)
 
     @override
     def next(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
         change_index = self.change
-        start = self.start
-        end = self.end
-
-        while True:
-            change = cast(FileChange, changes[change_index])
-
-            # Try to find the next hunk start
-            start = end
-            while start < len(change.lines):
-                if change.lines[start].status != "unchanged":
-                    break
-                start += 1
-            else:
-                # No hunk found, so go to the next file change and try again
-                while True:
-                    change_index = (change_index + 1) % len(changes)
-                    if ChangeRef(change_index) not in opened:
-                        continue
+        change = cast(FileChange, changes[change_index])
 
-                    next_change = changes[change_index]
-                    if isinstance(next_change, FILE_CHANGE_TYPES):
-                        break
+        # Try to find the next hunk start, otherwise go to the next file
+        # changes until we find one
+        line = find_changed_line(change.lines, range(self.end, len(change.lines)))
+        while line is None:
+            change_index, change = find_file_change(changes, opened, change_index, 1)
+            line = find_changed_line(change.lines, range(len(change.lines)))
 
-                end = 0
-                continue
-
-            # Find the start of the hunk
-            end = start + 1
-            while end < len(change.lines) and change.lines[end].status != "unchanged":
-                end += 1
-
-            return HunkCursor(change_index, start, end)
+        start, end = find_hunk(change.lines, line)
+        return HunkCursor(change_index, start, end)
 
     @override
     def first(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
-        change_index = 0
-        while True:
-            change = changes[change_index]
-            if isinstance(change, FILE_CHANGE_TYPES):
-                break
-            change_index += 1
-
-        start = 0
-        while change.lines[start].status == "unchanged":
-            start += 1
-
-        end = start + 1
-        while end < len(change.lines) and change.lines[end].status != "unchanged":
-            end += 1
-
+        change_index, change = find_file_change(changes, opened, -1, 1)
+        line = find_changed_line(change.lines, range(len(change.lines)))
+        assert line is not None
+        start, end = find_hunk(change.lines, line)
         return HunkCursor(change_index, start, end)
 
     @override
     def last(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
-        change_index = len(changes) - 1
-        while True:
-            change = changes[change_index]
-            if isinstance(change, FILE_CHANGE_TYPES):
-                break
-            change_index -= 1
-
-        end = len(change.lines)
-        while change.lines[end - 1].status == "unchanged":
-            end -= 1
-
-        start = end - 1
-        while start > 0 and change.lines[start - 1].status != "unchanged":
-            start -= 1
-
+        change_index, change = find_file_change(changes, opened, 0, -1)
+        line = find_changed_line(change.lines, range(len(change.lines) - 1, -1, -1))
+        assert line is not None
+        start, end = find_hunk(change.lines, line)
         return HunkCursor(change_index, start, end)
 
     @override
@@ -294,14 +223,11 @@ class HunkCursor(Cursor):
             yield LineRef(self.change, line)
 
 
+@dataclass(frozen=True, slots=True)
 class LineCursor(Cursor):
     change: int
     line: int
 
-    def __init__(self, change: int, line: int):
-        self.change = change
-        self.line = line
-
     @override
     def is_change_selected(self, change: int) -> bool:
         return self.change == change
@@ -321,106 +247,50 @@ class LineCursor(Cursor):
     @override
     def prev(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
         change_index = self.change
-        line = self.line
-
-        while True:
-            change = cast(FileChange, changes[change_index])
+        change = cast(FileChange, changes[change_index])
 
-            # Try to find the previous line
-            while line > 0:
-                line -= 1
-                if change.lines[line].status != "unchanged":
-                    break
-            else:
-                # No line found, so go to the previous file change and try
-                # again
-                while True:
-                    change_index = (change_index - 1) % len(changes)
-                    if ChangeRef(change_index) not in opened:
-                        continue
+        # Try to find the previous line, otherwise go to the previous file
+        # changes until we find one
+        line = find_changed_line(change.lines, range(self.line - 1, -1, -1))
+        while line is None:
+            change_index, change = find_file_change(changes, opened, change_index, -1)
+            line = find_changed_line(change.lines, range(len(change.lines) - 1, -1, -1))
 
-                    prev_change = changes[change_index]
-                    if isinstance(prev_change, FILE_CHANGE_TYPES):
-                        break
-
-                line = len(prev_change.lines)
-                continue
-
-            return LineCursor(change_index, line)
+        return LineCursor(change_index, line)
 
     @override
     def next(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
         change_index = self.change
-        line = self.line
-
-        while True:
-            change = cast(FileChange, changes[change_index])
-
-            # Try to find the next line
-            while line + 1 < len(change.lines):
-                line += 1
-                if change.lines[line].status != "unchanged":
-                    break
-            else:
-                # No line found, so go to the previous file change and try
-                # again
-                while True:
-                    change_index = (change_index + 1) % len(changes)
-                    if ChangeRef(change_index) not in opened:
-                        continue
-
-                    next_change = changes[change_index]
-                    if isinstance(next_change, FILE_CHANGE_TYPES):
-                        break
+        change = cast(FileChange, changes[change_index])
 
-                line = -1
-                continue
+        # Try to find the next line, otherwise go to the next file changes
+        # until we find one
+        line = find_changed_line(change.lines, range(self.line + 1, len(change.lines)))
+        while line is None:
+            change_index, change = find_file_change(changes, opened, change_index, 1)
+            line = find_changed_line(change.lines, range(len(change.lines)))
 
-            return LineCursor(change_index, line)
+        return LineCursor(change_index, line)
 
     @override
     def first(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
-        change_index = 0
-        while True:
-            change = changes[change_index]
-            if isinstance(change, FILE_CHANGE_TYPES):
-                break
-            change_index += 1
-
-        line = 0
-        while change.lines[line].status == "unchanged":
-            line += 1
-
+        change_index, change = find_file_change(changes, opened, -1, 1)
+        line = find_changed_line(change.lines, range(len(change.lines)))
+        assert line is not None
         return LineCursor(change_index, line)
 
     @override
     def last(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
-        change_index = len(changes) - 1
-        while True:
-            change = changes[change_index]
-            if isinstance(change, FILE_CHANGE_TYPES):
-                break
-            change_index -= 1
-
-        line = len(change.lines) - 1
-        while change.lines[line].status == "unchanged":
-            line -= 1
-
+        change_index, change = find_file_change(changes, opened, 0, -1)
+        line = find_changed_line(change.lines, range(len(change.lines) - 1, -1, -1))
+        assert line is not None
         return LineCursor(change_index, line)
 
     @override
     def grow(self, changes: Sequence[Change], opened: set[ChangeRef]) -> Cursor:
         # Expand current line into the hunk it is in
         change = cast(FileChange, changes[self.change])
-
-        start = self.line
-        while start > 0 and change.lines[start - 1].status != "unchanged":
-            start -= 1
-
-        end = self.line + 1
-        while end < len(change.lines) and change.lines[end].status != "unchanged":
-            end += 1
-
+        start, end = find_hunk(change.lines, self.line)
         return HunkCursor(self.change, start, end)
 
     @override
@@ -431,3 +301,37 @@ class LineCursor(Cursor):
     @override
     def refs(self, changes: Sequence[Change]) -> Iterator[Ref]:
         yield LineRef(self.change, self.line)
+
+
+def find_file_change(
+    changes: Sequence[Change], opened: set[ChangeRef], index: int, step: int
+) -> tuple[int, FileChange]:
+    # Walk from the given index in the given direction, wrapping around, until
+    # we find an opened file change
+    size = len(changes)
+    while True:
+        index = (index + step) % size
+        change = changes[index]
+        if isinstance(change, FILE_CHANGE_TYPES) and ChangeRef(index) in opened:
+            return index, change
+
+
+def find_changed_line(lines: Sequence[Line], indexes: Iterable[int]) -> int | None:
+    for index in indexes:
+        if lines[index].status != "unchanged":
+            return index
+    return None
+
+
+def find_hunk(lines: Sequence[Line], line: int) -> tuple[int, int]:
+    # Expand the changed line in both directions to the hunk it is in
+    start = line
+    while start > 0 and lines[start - 1].status != "unchanged":
+        start -= 1
+
+    end = line + 1
+    size = len(lines)
+    while end < size and lines[end].status != "unchanged":
+        end += 1
+
+    return start, end
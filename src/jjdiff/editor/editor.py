@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from collections.abc import Iterable, Sequence, Set
+from collections import deque
+from collections.abc import Iterable, Mapping, Sequence, Set
 from typing import override
 
 from jjdiff.config import get_config
@@ -17,10 +18,11 @@ from ..change import (
     get_dependencies,
 )
 from .cursor import ChangeCursor, Cursor
-from .render.changes import render_changes
+from .render.changes import ChangeCache, render_changes
 from .render.markers import SelectionMarker
 
 SCROLLBAR_STYLE = TextStyle(fg="bright black")
+MAX_UNDO_STACK_SIZE = 1000
 
 
 class Action(ABC):
@@ -42,10 +44,12 @@ class AddIncludes(Action):
     @override
     def apply(self, editor: "Editor") -> None:
         editor.included |= self.refs
+        editor.invalidate_refs(self.refs)
 
     @override
     def revert(self, editor: "Editor") -> None:
         editor.included -= self.refs
+        editor.invalidate_refs(self.refs)
 
 
 class RemoveIncludes(Action):
@@ -57,10 +61,12 @@ class RemoveIncludes(Action):
     @override
     def apply(self, editor: "Editor") -> None:
         editor.included -= self.refs
+        editor.invalidate_refs(self.refs)
 
     @override
     def revert(self, editor: "Editor") -> None:
         editor.included |= self.refs
+        editor.invalidate_refs(self.refs)
 
 
 class Editor(Console[Set[Ref] | None]):
@@ -72,11 +78,13 @@ class Editor(Console[Set[Ref] | None]):
 
     opened: set[ChangeRef]
 
-    undo_stack: list[tuple[Action, set[ChangeRef], Cursor]]
-    redo_stack: list[tuple[Action, set[ChangeRef], Cursor]]
+    undo_stack: deque[tuple[Action, set[ChangeRef], Cursor]]
+    redo_stack: deque[tuple[Action, set[ChangeRef], Cursor]]
 
     cursor: Cursor
 
+    rendered_changes: ChangeCache
+
     def __init__(self, changes: Sequence[Change]):
         super().__init__(SCROLLBAR_STYLE)
         self.changes = changes
@@ -85,23 +93,33 @@ class Editor(Console[Set[Ref] | None]):
         self.include_dependencies = {}
         self.include_dependants = {}
 
-        for dependency, dependant in get_dependencies(changes):
+        for dependant, dependency in get_dependencies(changes):
             self.include_dependencies.setdefault(dependant, set()).add(dependency)
             self.include_dependants.setdefault(dependency, set()).add(dependant)
 
         self.opened = set()
 
-        self.undo_stack = []
-        self.redo_stack = []
+        # Every entry keeps a copy of the opened changes, so we only keep the
+        # most recent ones around
+        self.undo_stack = deque(maxlen=MAX_UNDO_STACK_SIZE)
+        self.redo_stack = deque(maxlen=MAX_UNDO_STACK_SIZE)
 
         self.cursor = ChangeCursor(0)
 
+        self.rendered_changes = {}
+
         if not changes:
             self.set_result(frozenset())
 
     @override
     def render(self) -> Drawable:
-        return render_changes(self.changes, self.cursor, self.included, self.opened)
+        return render_changes(
+            self.changes,
+            self.cursor,
+            self.included,
+            self.opened,
+            self.rendered_changes,
+        )
 
     @override
     def post_render(self, state: State) -> None:
@@ -120,6 +138,12 @@ class Editor(Console[Set[Ref] | None]):
         else:
             getattr(self, command)()
 
+    def invalidate_refs(self, refs: Iterable[Ref]) -> None:
+        # The included refs changed, so the changes they belong to have to be
+        # rendered again
+        for ref in refs:
+            self.rendered_changes.pop(ref.change, None)
+
     def exit(self) -> None:
         self.set_result(None)
 
@@ -168,33 +192,22 @@ class Editor(Console[Set[Ref] | None]):
         new_refs = refs - self.included
 
         if new_refs:
-            # Ensure we also include all dependencies
-            while dependencies := {
-                dependency
-                for dependant in refs
-                for dependency in self.include_dependencies.get(dependant, set())
-                if dependency not in new_refs
-            }:
-                new_refs.update(dependencies)
-
-            # Remove dependencies that were already included
+            # Ensure we also include all dependencies, except for the ones
+            # that were already included
+            new_refs = get_closure(refs, self.include_dependencies)
             new_refs.difference_update(self.included)
 
             self.apply_action(AddIncludes(new_refs))
         else:
-            # Ensure we also include all dependants
-            while dependants := {
-                dependant
-                for dependency in refs
-                for dependant in self.include_dependants.get(dependency, set())
-                if dependant not in refs
-            }:
-                refs.update(dependants)
-
-            # Remove dependencies that are not included
+            # Ensure we also exclude all dependants, but only the ones that
+            # are included
+            refs = get_closure(refs, self.include_dependants)
             refs.intersection_update(self.included)
 
-            self.apply_action(RemoveIncludes(refs))
+            # Without any refs there is nothing to undo, so we do not want an
+            # entry on the undo stack for it
+            if refs:
+                self.apply_action(RemoveIncludes(refs))
 
         self.rerender()
         self.next_cursor()
@@ -230,3 +243,17 @@ class Editor(Console[Set[Ref] | None]):
         self.redo_stack.clear()
         self.undo_stack.append((action, self.opened.copy(), self.cursor))
         action.apply(self)
+
+
+def get_closure(refs: Iterable[Ref], edges: Mapping[Ref, Set[Ref]]) -> set[Ref]:
+    closure = set(refs)
+    todo = list(closure)
+
+    # Every ref only has to be expanded once, when it is first found
+    while todo:
+        for ref in edges.get(todo.pop(), ()):
+            if ref not in closure:
+                closure.add(ref)
+                todo.append(ref)
+
+    return closure
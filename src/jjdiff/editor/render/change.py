@@ -1,3 +1,4 @@
+from collections.abc import Mapping
 from pathlib import Path
 from typing import Literal
 
@@ -43,7 +44,7 @@ def render_change(
     cursor: Cursor | None,
     included: set[Ref] | None,
     opened: bool,
-    renames: dict[Path, Path],
+    renames: Mapping[Path, Path],
 ) -> Drawable:
     change_refs = set(get_change_refs(change_index, change))
 
@@ -1,4 +1,7 @@
+from collections.abc import Iterator
 from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import NamedTuple
 
 from jjdiff.config import get_config
 from jjdiff.tui.drawable import Drawable
@@ -29,52 +32,27 @@ def render_change_file(
     line_nums: bool = True,
 ) -> Drawable:
     drawables: list[Drawable] = []
-    ranges: list[tuple[int, int]] = []
-
-    index = 0
-    while index < len(lines):
-        line = lines[index]
-        index += 1
-
-        if line.status == "unchanged":
-            continue
-
-        start = max(index - MIN_CONTEXT, 0)
-
-        while index < len(lines) and lines[index].status != "unchanged":
-            index += 1
-
-        end = min(index + MIN_CONTEXT, len(lines))
-
-        if ranges and start - ranges[-1][1] < MIN_OMITTED:
-            start, _ = ranges.pop()
-
-        ranges.append((start, end))
+    omitted_selected = cursor is not None and cursor.is_all_lines_selected(change_index)
 
     index = 0
     old_line = 1
     new_line = 1
 
-    for start, end in ranges:
+    for start, end in get_ranges(lines):
         if index < start:
-            for line in lines[index:start]:
+            for line_index in range(index, start):
+                line = lines[line_index]
                 if line.old is not None:
                     old_line += 1
                 if line.new is not None:
                     new_line += 1
 
-            drawables.append(
-                render_omitted(
-                    start - index,
-                    cursor is not None and cursor.is_all_lines_selected(change_index),
-                )
-            )
-        else:
-            assert index == start, repr(ranges)
+            drawables.append(render_omitted(start - index, omitted_selected))
 
         rows: list[tuple[Drawable, ...]] = []
 
-        for line_index, line in enumerate(lines[start:end], start):
+        for line_index in range(start, end):
+            line = lines[line_index]
             selected = cursor is not None and cursor.is_line_selected(
                 change_index, line_index
             )
@@ -140,16 +118,44 @@ def render_change_file(
         index = end
 
     if index < len(lines):
-        drawables.append(
-            render_omitted(
-                len(lines) - index,
-                cursor is not None and cursor.is_all_lines_selected(change_index),
-            )
-        )
+        drawables.append(render_omitted(len(lines) - index, omitted_selected))
 
     return Rows(drawables)
 
 
+def get_ranges(lines: list[Line]) -> Iterator[tuple[int, int]]:
+    # Yields the ranges of lines to show, which are the hunks with some context
+    # around them, merged when the gap between them would be too small to omit
+    prev_range: tuple[int, int] | None = None
+
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+
+        if line.status == "unchanged":
+            continue
+
+        start = max(index - MIN_CONTEXT, 0)
+
+        while index < len(lines) and lines[index].status != "unchanged":
+            index += 1
+
+        end = min(index + MIN_CONTEXT, len(lines))
+
+        if prev_range is not None:
+            if start - prev_range[1] < MIN_OMITTED:
+                start = prev_range[0]
+            else:
+                yield prev_range
+
+        prev_range = (start, end)
+
+    if prev_range is not None:
+        yield prev_range
+
+
+@lru_cache
 def render_omitted(lines: int, selected: bool) -> Drawable:
     if lines == 1:
         plural = ""
@@ -170,6 +176,16 @@ def render_omitted(lines: int, selected: bool) -> Drawable:
     )
 
 
+class LineStyle(NamedTuple):
+    gutter: str
+    gutter_style: TextStyle
+    gutter_suffix: Text | None
+    gutter_padding: Drawable
+    content_style: TextStyle
+    underlined_style: TextStyle
+    padding: Drawable
+
+
 def render_line(
     line: int,
     status: LineStatus,
@@ -179,84 +195,106 @@ def render_line(
     underline: list[tuple[int, int]],
     line_nums: bool,
 ) -> tuple[Drawable, Drawable]:
-    gutter: Drawable
-    drawable: Drawable
+    if content is None:
+        return render_missing_line(selected)
+
+    style = get_line_style(status, selected, included)
 
     if line_nums:
         line_num = format(line, ">4")
     else:
         line_num = " " * 4
 
-    if content is None:
-        fg = SELECTED_FG[selected]
-        bg = SELECTED_BG[selected]
-
-        gutter = Text("\u258f" + "\u2571" * 6, TextStyle(fg=fg, bg=bg))
-        gutter_padding = gutter
-        drawable = Fill("\u2571", TextStyle(fg=fg, bg=bg))
-        drawable_padding = drawable
-
-    elif status == "unchanged":
-        fg = SELECTED_FG[selected]
-        bg = SELECTED_BG[selected]
-
-        gutter = Text(f"\u258f {line_num} ", TextStyle(fg=fg, bg=bg))
-        gutter_padding = Text("\u258f      ", TextStyle(fg=fg, bg=bg))
-        drawable = render_line_content(content, underline, TextStyle(bg=bg))
-        drawable_padding = Fill(" ", TextStyle(bg=bg))
-
-    elif included is True:
-        fg = STATUS_COLOR[status]
-        bg = SELECTED_BG[selected]
-
-        gutter = Text.join(
-            [
-                Text(f" \u2713{line_num}", TextStyle(fg="black", bg=fg, bold=True)),
-                Text("\u258c", TextStyle(fg=fg, bg=bg)),
-            ]
-        )
-        gutter_padding = Text.join(
-            [
-                Text("      ", TextStyle(fg="black", bg=fg, bold=True)),
-                Text("\u258c", TextStyle(fg=fg, bg=bg)),
-            ]
-        )
+    gutter = Text(style.gutter.format(line_num), style.gutter_style)
+    if style.gutter_suffix is not None:
+        gutter = Text.join([gutter, style.gutter_suffix])
 
-        drawable = render_line_content(
-            content,
-            underline,
-            TextStyle(fg=fg, bg=bg, bold=True, italic=True),
-        )
-        drawable_padding = Fill(" ", TextStyle(bg=bg))
+    drawable = render_line_content(
+        content,
+        underline,
+        style.content_style,
+        style.underlined_style,
+    )
 
-    elif included is False:
-        fg = STATUS_COLOR[status]
-        bg = SELECTED_BG[selected]
+    return Grid.Cell(gutter, style.gutter_padding), Grid.Cell(drawable, style.padding)
 
-        gutter = Text(f"\u258c\u2717{line_num} ", TextStyle(fg=fg, bg=bg))
-        gutter_padding = Text("\u258c      ", TextStyle(fg=fg, bg=bg))
-        drawable = render_line_content(content, underline, TextStyle(fg=fg, bg=bg))
-        drawable_padding = Fill(" ", TextStyle(bg=bg))
 
-    else:
-        fg = STATUS_COLOR[status]
-        bg = SELECTED_BG[selected]
+@lru_cache(None)
+def render_missing_line(selected: bool) -> tuple[Drawable, Drawable]:
+    style = TextStyle(fg=SELECTED_FG[selected], bg=SELECTED_BG[selected])
+
+    gutter = Text("\u258f" + "\u2571" * 6, style)
+    drawable = Fill("\u2571", style)
+
+    return Grid.Cell(gutter, gutter), Grid.Cell(drawable, drawable)
+
+
+@lru_cache(None)
+def get_line_style(
+    status: LineStatus,
+    selected: bool,
+    included: bool | None,
+) -> LineStyle:
+    # There are only a handful of combinations, so we build the styles for
+    # each of them once instead of for every line we render
+    bg = SELECTED_BG[selected]
+    padding = Fill(" ", TextStyle(bg=bg))
+
+    if status == "unchanged":
+        style = TextStyle(fg=SELECTED_FG[selected], bg=bg)
+        content_style = TextStyle(bg=bg)
+
+        return LineStyle(
+            "\u258f {} ",
+            style,
+            None,
+            Text("\u258f      ", style),
+            content_style,
+            content_style.update(underline=True),
+            padding,
+        )
 
-        gutter = Text(f"\u258c {line_num} ", TextStyle(fg=fg, bg=bg))
-        gutter_padding = Text("\u258c      ", TextStyle(fg=fg, bg=bg))
-        drawable = render_line_content(content, underline, TextStyle(fg=fg, bg=bg))
-        drawable_padding = Fill(" ", TextStyle(bg=bg))
+    fg = STATUS_COLOR[status]
+
+    if included is True:
+        gutter_style = TextStyle(fg="black", bg=fg, bold=True)
+        gutter_suffix = Text("\u258c", TextStyle(fg=fg, bg=bg))
+        content_style = TextStyle(fg=fg, bg=bg, bold=True, italic=True)
+
+        return LineStyle(
+            " \u2713{}",
+            gutter_style,
+            gutter_suffix,
+            Text.join([Text("      ", gutter_style), gutter_suffix]),
+            content_style,
+            content_style.update(underline=True),
+            padding,
+        )
 
-    return Grid.Cell(gutter, gutter_padding), Grid.Cell(drawable, drawable_padding)
+    if included is False:
+        gutter = "\u258c\u2717{} "
+    else:
+        gutter = "\u258c {} "
+
+    style = TextStyle(fg=fg, bg=bg)
+
+    return LineStyle(
+        gutter,
+        style,
+        None,
+        Text("\u258c      ", style),
+        style,
+        style.update(underline=True),
+        padding,
+    )
 
 
 def render_line_content(
     content: str,
     underline: list[tuple[int, int]],
     style: TextStyle,
+    underlined_style: TextStyle,
 ) -> Text:
-    underlined_style = style.update(underline=True)
-
     texts: list[Text] = []
     index = 0
 
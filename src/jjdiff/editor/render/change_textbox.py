@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from jjdiff.tui.drawable import Drawable
 from jjdiff.tui.fill import Fill
 from jjdiff.tui.grid import Grid
@@ -11,7 +13,12 @@ def render_change_textbox(
     change_index: int, cursor: Cursor | None, content: str
 ) -> Drawable:
     selected = cursor is not None and cursor.is_all_lines_selected(change_index)
+    return render_textbox(content, selected)
+
 
+# The textboxes only show a few fixed messages, so they can be shared
+@lru_cache
+def render_textbox(content: str, selected: bool) -> Drawable:
     fg = SELECTED_FG[selected]
     bg = SELECTED_BG[selected]
 
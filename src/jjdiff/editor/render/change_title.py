@@ -1,5 +1,7 @@
+from collections.abc import Mapping
+from functools import lru_cache
 from pathlib import Path
-from typing import Literal
+from typing import Literal, NamedTuple
 
 from jjdiff.tui.drawable import Drawable
 from jjdiff.tui.rows import Rows
@@ -26,11 +28,18 @@ from .styles import SELECTED_BG
 type ChangeIncluded = Literal["full", "partial", "none"]
 
 
+class TitleStyle(NamedTuple):
+    text: TextStyle
+    path: TextStyle
+    added: TextStyle
+    deleted: TextStyle
+
+
 def render_change_title(
     change: Change,
     selected: bool,
     included: ChangeIncluded | None,
-    renames: dict[Path, Path],
+    renames: Mapping[Path, Path],
 ) -> Drawable:
     fg: TextColor
 
@@ -90,54 +99,21 @@ def render_change_title(
             file_type = "symlink"
             fg = "red"
 
-    bg = SELECTED_BG[selected]
-
-    if isinstance(change, Rename):
-        renames[change.old_path] = change.new_path
-    else:
+    if not isinstance(change, Rename):
         path = renames.get(path, path)
 
-    match included:
-        case "full":
-            action_text = Text.join(
-                [
-                    Text(f" \u2713 {action}", TextStyle(fg="black", bg=fg, bold=True)),
-                    Text("\u258c", TextStyle(fg=fg, bg=bg)),
-                ]
-            )
-            bold = True
-
-        case "partial":
-            action_text = Text.join(
-                [
-                    Text(f" \u2212 {action}", TextStyle(fg="black", bg=fg, bold=True)),
-                    Text("\u258c", TextStyle(fg=fg, bg=bg)),
-                ]
-            )
-            bold = True
-
-        case "none":
-            action_text = Text(f"\u258c\u2717 {action} ", TextStyle(fg=fg, bg=bg))
-            bold = False
-
-        case None:
-            action_text = Text(f"\u258c {action} ", TextStyle(fg=fg, bg=bg))
-            bold = False
+    bold = included == "full" or included == "partial"
+    style = get_title_style(selected, bold)
 
     texts = [
-        action_text,
-        Text(f"{file_type} ", TextStyle(bg=bg, bold=bold)),
-        Text(str(path), TextStyle(fg="blue", bg=bg, bold=bold)),
+        render_title_action(action, fg, selected, included),
+        Text(f"{file_type} ", style.text),
+        Text(str(path), style.path),
     ]
 
     if isinstance(change, Rename):
-        texts.append(Text(" to ", TextStyle(bg=bg, bold=bold)))
-        texts.append(
-            Text(
-                str(change.new_path),
-                TextStyle(fg="blue", bg=bg, bold=bold),
-            )
-        )
+        texts.append(Text(" to ", style.text))
+        texts.append(Text(str(change.new_path), style.path))
 
     if isinstance(change, FILE_CHANGE_TYPES):
         added = 0
@@ -156,16 +132,57 @@ def render_change_title(
                     pass
 
         if added:
-            texts.append(
-                Text(f" +{added}", style=TextStyle(bold=True, bg=bg, fg="green"))
-            )
+            texts.append(Text(f" +{added}", style.added))
         if deleted:
-            texts.append(
-                Text(f" -{deleted}", style=TextStyle(bold=True, bg=bg, fg="red"))
-            )
+            texts.append(Text(f" -{deleted}", style.deleted))
 
     title = Text.join(texts)
     if selected:
         return Rows([SelectionMarker(), title])
     else:
         return title
+
+
+@lru_cache(None)
+def render_title_action(
+    action: str,
+    fg: TextColor,
+    selected: bool,
+    included: ChangeIncluded | None,
+) -> Text:
+    bg = SELECTED_BG[selected]
+
+    match included:
+        case "full":
+            return Text.join(
+                [
+                    Text(f" \u2713 {action}", TextStyle(fg="black", bg=fg, bold=True)),
+                    Text("\u258c", TextStyle(fg=fg, bg=bg)),
+                ]
+            )
+
+        case "partial":
+            return Text.join(
+                [
+                    Text(f" \u2212 {action}", TextStyle(fg="black", bg=fg, bold=True)),
+                    Text("\u258c", TextStyle(fg=fg, bg=bg)),
+                ]
+            )
+
+        case "none":
+            return Text(f"\u258c\u2717 {action} ", TextStyle(fg=fg, bg=bg))
+
+        case None:
+            return Text(f"\u258c {action} ", TextStyle(fg=fg, bg=bg))
+
+
+@lru_cache(None)
+def get_title_style(selected: bool, bold: bool) -> TitleStyle:
+    bg = SELECTED_BG[selected]
+
+    return TitleStyle(
+        text=TextStyle(bg=bg, bold=bold),
+        path=TextStyle(fg="blue", bg=bg, bold=bold),
+        added=TextStyle(bold=True, bg=bg, fg="green"),
+        deleted=TextStyle(bold=True, bg=bg, fg="red"),
+    )
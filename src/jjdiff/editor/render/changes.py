@@ -1,6 +1,7 @@
-from collections.abc import Sequence
+from collections.abc import Iterable
 from pathlib import Path
 
+from jjdiff.tui.cache import Cache
 from jjdiff.tui.drawable import Drawable
 from jjdiff.tui.rows import Rows
 from jjdiff.tui.text import Text
@@ -9,16 +10,22 @@ from ...change import (
     Change,
     ChangeRef,
     Ref,
+    Rename,
 )
 from ..cursor import Cursor
 from .change import render_change
 
+# Rendered changes by index, together with the cursor if it was on the change
+# and whether the change was opened
+type ChangeCache = dict[int, tuple[Cursor | None, bool, Drawable]]
+
 
 def render_changes(
-    changes: Sequence[Change],
+    changes: Iterable[Change],
     cursor: Cursor | None,
     included: set[Ref] | None,
     opened: set[ChangeRef] | None,
+    cache: ChangeCache | None = None,
 ) -> Drawable:
     drawables: list[Drawable] = []
     renames: dict[Path, Path] = {}
@@ -26,11 +33,32 @@ def render_changes(
     for i, change in enumerate(changes):
         change_opened = opened is None or ChangeRef(i) in opened
 
-        drawables.append(
-            render_change(i, change, cursor, included, change_opened, renames)
-        )
+        # A change only depends on the cursor when the cursor is on it, so we
+        # can reuse the previous render of all other changes
+        if cursor is not None and cursor.is_change_selected(i):
+            change_cursor = cursor
+        else:
+            change_cursor = None
+
+        cached = None if cache is None else cache.get(i)
+        if cached is not None and cached[:2] == (change_cursor, change_opened):
+            drawable = cached[2]
+        else:
+            drawable = render_change(
+                i, change, cursor, included, change_opened, renames
+            )
+            if cache is not None:
+                # Also keep the rendered lines, as those stay the same as
+                # long as the width does not change
+                drawable = Cache(drawable)
+                cache[i] = (change_cursor, change_opened, drawable)
+
+        drawables.append(drawable)
 
         if change_opened:
             drawables.append(Text())
 
+        if isinstance(change, Rename):
+            renames[change.old_path] = change.new_path
+
     return Rows(drawables)
@@ -0,0 +1,34 @@
+from collections.abc import Iterator
+from typing import Any, override
+
+from .drawable import Drawable, Marker
+
+
+class Cache(Drawable):
+    drawable: Drawable
+
+    _base_width: int | None
+    _size: tuple[int, int | None] | None
+    _lines: list[str | Marker[Any]]
+
+    def __init__(self, drawable: Drawable):
+        self.drawable = drawable
+
+        self._base_width = None
+        self._size = None
+        self._lines = []
+
+    @override
+    def base_width(self) -> int:
+        if self._base_width is None:
+            self._base_width = self.drawable.base_width()
+        return self._base_width
+
+    @override
+    def _render(self, width: int, height: int | None) -> Iterator[str | Marker[Any]]:
+        # Keep the lines of the last render, so rendering the same drawable
+        # again at the same size is free
+        if self._size != (width, height):
+            self._lines = list(self.drawable._render(width, height))
+            self._size = (width, height)
+        return iter(self._lines)
@@ -29,8 +29,10 @@ class Console[Result](ABC):
 
     _drawable: Drawable
     _lines: list[str]
+    _screen: list[str]
     _redraw: bool
     _rerender: bool
+    _resize: bool
     _keyboard: Keyboard
     _result: Result | NoResult
 
@@ -42,8 +44,10 @@ class Console[Result](ABC):
 
         self._drawable = Text("")
         self._lines = []
+        self._screen = []
         self._redraw = True
         self._rerender = True
+        self._resize = True
         self._keyboard = Keyboard()
         self._result = NO_RESULT
 
@@ -85,22 +89,47 @@ class Console[Result](ABC):
         else:
             rerendered = False
 
-        width, height = os.get_terminal_size()
-
-        if rerendered or width != self.width or height != self.height:
+        # Only query the terminal size when we got notified of a resize
+        if self._resize:
+            self._resize = False
+            width, height = os.get_terminal_size()
+            resized = width != self.width or height != self.height
             self.width = width
             self.height = height
+        else:
+            resized = False
+
+        if rerendered or resized:
             self._lines.clear()
-            self._lines.extend(self._drawable.render(width, height))
+            self._lines.extend(self._drawable.render(self.width, self.height))
+
+        # Build the whole frame first so it is written in one go
+        frame: list[str] = []
+
+        # After a resize the terminal might have moved things around, so we
+        # cannot trust what is on the screen anymore
+        if resized:
+            frame.append("\x1b[2J")
+            self._screen.clear()
+
+        # Only write the rows that differ from what is on the screen
+        screen = self._lines[: self.height]
+        for y, line in enumerate(screen):
+            if y >= len(self._screen) or self._screen[y] != line:
+                frame.append(f"\x1b[{y + 1};1H")
+                frame.append(line)
+
+        for y in range(len(screen), len(self._screen)):
+            frame.append(f"\x1b[{y + 1};1H\x1b[2K")
+
+        self._screen = screen
 
-        sys.stdout.write("\x1b[2J\x1b[H")
-        for line in self._lines[:height]:
-            sys.stdout.write(line)
-            sys.stdout.write("\x1b[1E")
-        sys.stdout.flush()
+        if frame:
+            write_and_flush("".join(frame))
 
     def run(self) -> Result:
         def on_resize(_signal: int, _frame: FrameType | None) -> None:
+            self._resize = True
             self.redraw()
 
         with ExitStack() as stack:
@@ -113,7 +142,7 @@ class Console[Result](ABC):
             stack.callback(termios.tcsetattr, sys.stdin, termios.TCSADRAIN, attrs)
 
             # hide cursor and switch to alternative buffer
-            sys.stdout.write("\x1b[?25l\x1b[?1049h")
+            write_and_flush("\x1b[?25l\x1b[?1049h")
             stack.callback(write_and_flush, "\x1b[?1049l\x1b[?25h")
 
             # Loop until we have a result
@@ -135,5 +164,8 @@ class Console[Result](ABC):
 
 
 def write_and_flush(content: str) -> None:
-    sys.stdout.write(content)
+    # Write the encoded content to the underlying buffer directly, this skips
+    # the newline translation and chunking of the text layer
     sys.stdout.flush()
+    sys.stdout.buffer.write(content.encode())
+    sys.stdout.buffer.flush()
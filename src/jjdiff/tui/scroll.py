@@ -65,15 +65,17 @@ class Scroll(Drawable):
             start = 0
             end = 0
 
+        # The scrollbar only has a few distinct cells, so we style them once
+        style_code = self.scrollbar_style.style_code
+        reset_code = self.scrollbar_style.reset_code
+        cells = {
+            key: style_code + char + reset_code for key, char in SCROLLBAR_CHAR.items()
+        }
+
         for y, line in enumerate(view):
             top = start <= y * 2 < end
             bot = start <= y * 2 + 1 < end
-            view[y] = (
-                line
-                + self.scrollbar_style.style_code
-                + SCROLLBAR_CHAR[(top, bot)]
-                + self.scrollbar_style.reset_code
-            )
+            view[y] = line + cells[top, bot]
 
         yield from view
 
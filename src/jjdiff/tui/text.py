@@ -1,5 +1,6 @@
 from collections.abc import Iterable, Iterator, Mapping
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Literal, overload, override
 
 from .drawable import Drawable
@@ -65,7 +66,9 @@ BG_CODES: Mapping[TextColor, str] = {
 }
 
 
-@dataclass
+# Styles are shared between a lot of texts, so they are immutable and cache
+# their escape codes
+@dataclass(frozen=True)
 class TextStyle:
     bold: bool = False
     italic: bool = False
@@ -73,7 +76,7 @@ class TextStyle:
     fg: TextColor | None = None
     bg: TextColor | None = None
 
-    @property
+    @cached_property
     def style_code(self) -> str:
         codes: list[str] = []
 
@@ -93,7 +96,7 @@ class TextStyle:
 
         return "\x1b[" + ";".join(codes) + "m"
 
-    @property
+    @cached_property
     def reset_code(self) -> str:
         if self.style_code:
             return "\x1b[0m"
@@ -1,13 +1,17 @@
 from pathlib import Path
+from unittest.mock import patch
 
 from jjdiff.change import (
+    AddBinary,
     AddFile,
     ChangeRef,
     DeleteFile,
     Line,
     LineRef,
     ModifyFile,
+    Rename,
     apply_changes,
+    get_dependencies,
     reverse_changes,
     split_changes,
 )
@@ -49,6 +53,57 @@ def test_modify_file(temp_dir_factory: DirFactory) -> None:
     assert read_spec(root) == {"foo.txt": "bar"}
 
 
+def test_modify_file_to_empty(temp_dir_factory: DirFactory) -> None:
+    root = temp_dir_factory({"foo.txt": "foo\nbar"})
+    changes = [
+        ModifyFile(Path("foo.txt"), [Line("foo", None), Line("bar", None)]),
+    ]
+    apply_changes(root, changes)
+    assert read_spec(root) == {"foo.txt": ""}
+
+
+def test_add_binary(temp_dir_factory: DirFactory) -> None:
+    content = temp_dir_factory({"foo.bin": b"\x00\xff"})
+    root = temp_dir_factory({})
+    changes = [
+        AddBinary(Path("foo.bin"), content / "foo.bin", False),
+    ]
+    apply_changes(root, changes)
+    assert read_spec(root) == {"foo.bin": b"\x00\xff"}
+
+
+def test_add_binary_copy_file_range_stops_early(
+    temp_dir_factory: DirFactory,
+) -> None:
+    content = temp_dir_factory({"foo.bin": b"\x00\xff"})
+    root = temp_dir_factory({})
+    changes = [
+        AddBinary(Path("foo.bin"), content / "foo.bin", False),
+    ]
+    with patch("os.copy_file_range", return_value=0, create=True):
+        apply_changes(root, changes)
+    assert read_spec(root) == {"foo.bin": b"\x00\xff"}
+
+
+def test_rename_file(temp_dir_factory: DirFactory) -> None:
+    root = temp_dir_factory({"foo.txt": "foo"})
+    changes = [
+        Rename(Path("foo.txt"), Path("bar/baz.txt")),
+    ]
+    apply_changes(root, changes)
+    assert read_spec(root) == {"bar/baz.txt": "foo"}
+
+
+def test_add_files_in_new_dir(temp_dir_factory: DirFactory) -> None:
+    root = temp_dir_factory({})
+    changes = [
+        AddFile(Path("foo/bar.txt"), [Line(None, "bar")], False),
+        AddFile(Path("foo/baz.txt"), [Line(None, "baz")], False),
+    ]
+    apply_changes(root, changes)
+    assert read_spec(root) == {"foo/bar.txt": "bar", "foo/baz.txt": "baz"}
+
+
 def test_usecase(temp_dir_factory: DirFactory) -> None:
     old = temp_dir_factory({"foo.txt": "foo\nbar"})
     new = temp_dir_factory({"foo.txt": "fooo\nbaz", "bar.txt": "barrr"})
@@ -77,3 +132,15 @@ def test_usecase(temp_dir_factory: DirFactory) -> None:
 
     apply_changes(new, new_to_sel)
     assert read_spec(new) == {"foo.txt": "foo\nbaz"}
+
+
+def test_dependencies() -> None:
+    changes = [
+        DeleteFile(Path("foo.txt"), [Line("foo", None)], False),
+        AddFile(Path("foo.txt"), [Line(None, "bar")], False),
+    ]
+    assert set(get_dependencies(changes)) == {
+        (ChangeRef(0), LineRef(0, 0)),
+        (ChangeRef(1), ChangeRef(0)),
+        (LineRef(1, 0), ChangeRef(1)),
+    }
@@ -0,0 +1,42 @@
+from jjdiff.deprioritize import compile_gitglobs
+
+
+def test_no_globs() -> None:
+    pattern = compile_gitglobs([])
+
+    assert not pattern.fullmatch("foo.txt")
+    assert not pattern.fullmatch("")
+
+
+def test_unanchored_glob() -> None:
+    pattern = compile_gitglobs(["*.lock"])
+
+    assert pattern.fullmatch("uv.lock")
+    assert pattern.fullmatch("foo/uv.lock")
+    assert pattern.fullmatch("foo/bar/uv.lock")
+    assert not pattern.fullmatch("uv.lock.txt")
+
+
+def test_anchored_glob() -> None:
+    pattern = compile_gitglobs(["/foo.txt"])
+
+    assert pattern.fullmatch("foo.txt")
+    assert not pattern.fullmatch("bar/foo.txt")
+
+
+def test_directory_glob() -> None:
+    pattern = compile_gitglobs(["build/"])
+
+    assert pattern.fullmatch("build/foo.txt")
+    assert pattern.fullmatch("build/foo/bar.txt")
+    assert pattern.fullmatch("foo/build/bar.txt")
+    assert not pattern.fullmatch("build.txt")
+
+
+def test_multiple_globs() -> None:
+    pattern = compile_gitglobs(["*.lock", "/vendor/"])
+
+    assert pattern.fullmatch("uv.lock")
+    assert pattern.fullmatch("vendor/foo.py")
+    assert not pattern.fullmatch("src/vendor/foo.py")
+    assert not pattern.fullmatch("src/foo.py")
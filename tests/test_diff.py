@@ -1,7 +1,19 @@
+import random
 from pathlib import Path
-
-from jjdiff.change import AddFile, ChangeMode, DeleteFile, Line, ModifyFile
-from jjdiff.diff import diff, diff_lines
+from unittest.mock import patch
+
+from jjdiff.change import (
+    AddFile,
+    AddSymlink,
+    ChangeMode,
+    DeleteBinary,
+    DeleteFile,
+    Line,
+    ModifyBinary,
+    ModifyFile,
+    Rename,
+)
+from jjdiff.diff import diff, diff_lines, get_binary_chunk_hashes, get_line_counts
 
 from .utils import DirFactory, ExecFile
 
@@ -46,6 +58,35 @@ def test_diff_lines_changed() -> None:
     assert line2.new == "baz"
 
 
+def test_diff_lines_repeated_lines() -> None:
+    old = ["{", "foo", "}", "", "{", "bar", "}", "", "{", "baz", "}"]
+    new = [
+        "{",
+        "foo",
+        "}",
+        "",
+        "{",
+        "qux",
+        "}",
+        "",
+        "{",
+        "bar",
+        "}",
+        "",
+        "{",
+        "baz",
+        "}",
+    ]
+
+    lines = diff_lines(old, new)
+
+    assert [line.old for line in lines if line.old is not None] == old
+    assert [line.new for line in lines if line.new is not None] == new
+    # Only the inserted block is added, the repeated lines around it stay
+    assert [line.status for line in lines].count("unchanged") == len(old)
+    assert "qux" in [line.new for line in lines if line.status == "added"]
+
+
 def test_diff_files_empty(temp_dir_factory: DirFactory) -> None:
     old_dir = temp_dir_factory({})
     new_dir = temp_dir_factory({})
@@ -62,6 +103,19 @@ def test_diff_files_add(temp_dir_factory: DirFactory) -> None:
     ]
 
 
+def test_diff_files_add_carriage_return(temp_dir_factory: DirFactory) -> None:
+    old_dir = temp_dir_factory({})
+    new_dir = temp_dir_factory({"foo.txt": "foo\rbar\r\n"})
+
+    assert diff(old_dir, new_dir) == [
+        AddFile(
+            Path("foo.txt"),
+            [Line(None, "foo\rbar\r"), Line(None, "")],
+            False,
+        ),
+    ]
+
+
 def test_diff_files_delete(temp_dir_factory: DirFactory) -> None:
     old_dir = temp_dir_factory({"foo.txt": "foo"})
     new_dir = temp_dir_factory({})
@@ -80,6 +134,13 @@ def test_diff_files_modify(temp_dir_factory: DirFactory) -> None:
     ]
 
 
+def test_diff_files_unchanged_empty(temp_dir_factory: DirFactory) -> None:
+    old_dir = temp_dir_factory({"foo.txt": ""})
+    new_dir = temp_dir_factory({"foo.txt": ""})
+
+    assert diff(old_dir, new_dir) == []
+
+
 def test_diff_files_modify_similar(temp_dir_factory: DirFactory) -> None:
     old_dir = temp_dir_factory({"bar.txt": "bar"})
     new_dir = temp_dir_factory({"bar.txt": "baz"})
@@ -96,3 +157,79 @@ def test_diff_files_modify_is_exec(temp_dir_factory: DirFactory) -> None:
     assert diff(old_dir, new_dir) == [
         ChangeMode(Path("foo.txt"), False, True),
     ]
+
+
+def test_diff_files_rename(temp_dir_factory: DirFactory) -> None:
+    old_dir = temp_dir_factory({"a.txt": "foo\nbar\nbaz", "b.txt": "\n"})
+    new_dir = temp_dir_factory({"c.txt": "\n \n", "d.txt": "foo\nbar\nqux"})
+
+    assert diff(old_dir, new_dir) == [
+        Rename(Path("a.txt"), Path("d.txt")),
+        ModifyFile(
+            Path("a.txt"),
+            [
+                Line("foo", "foo"),
+                Line("bar", "bar"),
+                Line("baz", None),
+                Line(None, "qux"),
+            ],
+        ),
+        Rename(Path("b.txt"), Path("c.txt")),
+        ModifyFile(
+            Path("b.txt"),
+            [Line("", ""), Line(None, " "), Line("", "")],
+        ),
+    ]
+
+
+def test_diff_files_rename_binary(temp_dir_factory: DirFactory) -> None:
+    data = b"\xff" + random.Random(0).randbytes(1 << 16)
+    old_dir = temp_dir_factory({"foo.bin": data})
+    new_dir = temp_dir_factory({"bar.bin": data[: 1 << 15] + b"baz" + data[1 << 15 :]})
+
+    rename, modify = diff(old_dir, new_dir)
+    assert rename == Rename(Path("foo.bin"), Path("bar.bin"))
+    assert isinstance(modify, ModifyBinary)
+
+
+def test_diff_files_no_rename_candidates(temp_dir_factory: DirFactory) -> None:
+    # Content is only chunked or counted when there is content of the same
+    # kind on the other side that it could be renamed to
+    old_dir = temp_dir_factory({"foo.bin": b"\xff" * (1 << 16), "foo.txt": "foo"})
+    new_dir = temp_dir_factory({"bar.txt": "bar"})
+
+    with (
+        patch("jjdiff.diff.get_binary_chunk_hashes", side_effect=AssertionError),
+        patch("jjdiff.diff.get_line_counts", wraps=get_line_counts) as line_counts,
+    ):
+        changes = diff(old_dir, new_dir)
+        assert line_counts.call_count == 2
+
+    with patch("jjdiff.diff.get_line_counts", side_effect=AssertionError):
+        changes = diff(old_dir, temp_dir_factory({}))
+
+    assert [type(change) for change in changes] == [DeleteBinary, DeleteFile]
+
+
+def test_binary_chunk_hashes(temp_dir_factory: DirFactory) -> None:
+    data = random.Random(0).randbytes(1 << 16)
+    root = temp_dir_factory({"empty.bin": b"", "foo.bin": data})
+
+    assert list(get_binary_chunk_hashes(root / "empty.bin")) == []
+
+    # Stopping halfway should still close the file cleanly, closing the map
+    # raises a BufferError if a view into it was not released
+    chunks = get_binary_chunk_hashes(root / "foo.bin")
+    first = next(chunks)
+    chunks.close()
+
+    assert first in set(get_binary_chunk_hashes(root / "foo.bin"))
+
+
+def test_diff_files_add_symlink_outside(temp_dir_factory: DirFactory) -> None:
+    old_dir = temp_dir_factory({})
+    new_dir = temp_dir_factory({"foo": Path("../bar")})
+
+    assert diff(old_dir, new_dir) == [
+        AddSymlink(Path("foo"), Path("../bar")),
+    ]
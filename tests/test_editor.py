@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from jjdiff.change import (
+    AddFile,
+    ChangeRef,
+    DeleteFile,
+    Line,
+    LineRef,
+    split_changes,
+)
+from jjdiff.editor.editor import Editor
+
+
+def test_select_transitive_dependencies() -> None:
+    editor = Editor(
+        [
+            DeleteFile(Path("foo.txt"), [Line("foo", None)], False),
+            AddFile(Path("foo.txt"), [Line(None, "bar")], False),
+        ]
+    )
+
+    # The added line needs the added file, which needs the deleted file,
+    # which needs the deleted line
+    editor.select_refs([LineRef(1, 0)])
+    assert editor.included == {
+        ChangeRef(0),
+        LineRef(0, 0),
+        ChangeRef(1),
+        LineRef(1, 0),
+    }
+
+    # And the other way around for excluding
+    editor.select_refs([LineRef(0, 0)])
+    assert editor.included == set()
+
+
+def test_select_line_of_added_file() -> None:
+    changes = [AddFile(Path("foo.txt"), [Line(None, "foo")], False)]
+    editor = Editor(changes)
+
+    editor.select_refs([LineRef(0, 0)])
+    assert editor.included == {ChangeRef(0), LineRef(0, 0)}
+
+    selected, _ = split_changes(changes, editor.included)
+    assert selected == changes